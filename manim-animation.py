@@ -12,12 +12,40 @@ The animation is designed for educational and presentation purposes, showing how
 different components interact within the MCP Waifu Chat Server ecosystem.
 """
 
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
 from manim import *
 import numpy as np
 
-class MCPWaifuChatExplanation(Scene):
-    def construct(self):
-        # Title
+
+@lru_cache(maxsize=256)
+def _boxed_label_template(color, width, height, text, font_size, opacity):
+    box = Rectangle(width=width, height=height, color=color).set_fill(color, opacity=opacity)
+    return VGroup(box, Text(text, font_size=font_size))
+
+
+def boxed_label(color, width, height, text, font_size, opacity=0.2):
+    """Filled rectangle with a centered label, copied from a cached template.
+
+    Building a Text runs Pango layout every time; copying a cached template
+    reuses the already shaped glyphs.
+    """
+    return _boxed_label_template(color, width, height, text, font_size, opacity).copy()
+
+
+class WaifuChatSections:
+    """Section builders shared by the full explanation and the per-section scenes.
+
+    Every section starts and ends on a blank frame, so the sections can be
+    rendered independently and concatenated without visible seams.
+    """
+
+    def show_title(self):
         title = Text("MCP Waifu Chat Server", font_size=48, color=BLUE)
         subtitle = Text("Architecture & Flow Explanation", font_size=32, color=BLUE_B)
         subtitle.next_to(title, DOWN)
@@ -27,24 +55,6 @@ class MCPWaifuChatExplanation(Scene):
         self.wait(2)
         self.play(FadeOut(title), FadeOut(subtitle))
 
-        # Architecture Overview
-        self.show_architecture()
-
-        # Data Flow
-        self.show_data_flow()
-
-        # AI Provider System
-        self.show_ai_providers()
-
-        # Database System
-        self.show_database_system()
-
-        # Configuration System
-        self.show_config_system()
-
-        # Conclusion
-        self.show_conclusion()
-
     def show_architecture(self):
         section_title = Text("1. System Architecture", font_size=36, color=YELLOW)
         self.play(Write(section_title))
@@ -54,32 +64,22 @@ class MCPWaifuChatExplanation(Scene):
         # --- Construct all components FIRST, without animating ---
 
         # Client
-        client = Rectangle(width=3, height=1, color=BLUE).set_fill(BLUE, opacity=0.2)
-        client_label = Text("MCP Client", font_size=20)
-        client_group = VGroup(client, client_label)
+        client_group = boxed_label(BLUE, 3, 1, "MCP Client", 20)
 
         # Server components
         server_box = Rectangle(width=6, height=4, color=GREEN).set_fill(GREEN, opacity=0.1)
 
         # API Layer - Create shape and label, then group them
-        api_layer_shape = Rectangle(width=5, height=0.8, color=BLUE_B).set_fill(BLUE_B, opacity=0.3)
-        api_label = Text("FastMCP API Layer", font_size=16)
-        api_layer = VGroup(api_layer_shape, api_label)
+        api_layer = boxed_label(BLUE_B, 5, 0.8, "FastMCP API Layer", 16, opacity=0.3)
 
         # AI Layer - Create shape and label, then group them
-        ai_layer_shape = Rectangle(width=5, height=0.8, color=PURPLE).set_fill(PURPLE, opacity=0.3)
-        ai_label = Text("AI Provider Layer", font_size=16)
-        ai_layer = VGroup(ai_layer_shape, ai_label)
+        ai_layer = boxed_label(PURPLE, 5, 0.8, "AI Provider Layer", 16, opacity=0.3)
 
         # DB Layer - Create shape and label, then group them
-        db_layer_shape = Rectangle(width=5, height=0.8, color=ORANGE).set_fill(ORANGE, opacity=0.3)
-        db_label = Text("SQLite Database", font_size=16)
-        db_layer = VGroup(db_layer_shape, db_label)
+        db_layer = boxed_label(ORANGE, 5, 0.8, "SQLite Database", 16, opacity=0.3)
 
         # Config Layer - Create shape and label, then group them
-        config_layer_shape = Rectangle(width=5, height=0.8, color=RED).set_fill(RED, opacity=0.3)
-        config_label = Text("Configuration", font_size=16)
-        config_layer = VGroup(config_layer_shape, config_label)
+        config_layer = boxed_label(RED, 5, 0.8, "Configuration", 16, opacity=0.3)
 
         # Arrange layers
         layers = VGroup(api_layer, ai_layer, db_layer, config_layer).arrange(DOWN, buff=0.1)
@@ -90,13 +90,9 @@ class MCPWaifuChatExplanation(Scene):
         components = VGroup(client_group, server_group).arrange(RIGHT, buff=1.5)
 
         # External services
-        openrouter = Rectangle(width=2, height=0.6, color=MAROON).set_fill(MAROON, opacity=0.3)
-        openrouter_label = Text("OpenRouter", font_size=14)
-        openrouter_group = VGroup(openrouter, openrouter_label).next_to(ai_layer, RIGHT, buff=1)
+        openrouter_group = boxed_label(MAROON, 2, 0.6, "OpenRouter", 14, opacity=0.3).next_to(ai_layer, RIGHT, buff=1)
 
-        gemini = Rectangle(width=2, height=0.6, color=TEAL).set_fill(TEAL, opacity=0.3)
-        gemini_label = Text("Gemini", font_size=14)
-        gemini_group = VGroup(gemini, gemini_label).next_to(openrouter_group, DOWN, buff=0.5)
+        gemini_group = boxed_label(TEAL, 2, 0.6, "Gemini", 14, opacity=0.3).next_to(openrouter_group, DOWN, buff=0.5)
 
         # Add arrows
         arrow1 = Arrow(client_group.get_right(), api_layer.get_left(), color=WHITE)
@@ -129,39 +125,25 @@ class MCPWaifuChatExplanation(Scene):
         # --- Construct all components FIRST, without animating ---
 
         # Step 1: User sends message
-        step1 = Rectangle(width=4, height=0.8, color=BLUE).set_fill(BLUE, opacity=0.2)
-        step1_text = Text("1. User sends chat message", font_size=18)
-        step1_group = VGroup(step1, step1_text)
+        step1_group = boxed_label(BLUE, 4, 0.8, "1. User sends chat message", 18)
 
         # Step 2: API receives request
-        step2 = Rectangle(width=4, height=0.8, color=GREEN).set_fill(GREEN, opacity=0.2)
-        step2_text = Text("2. FastMCP tool processes", font_size=18)
-        step2_group = VGroup(step2, step2_text)
+        step2_group = boxed_label(GREEN, 4, 0.8, "2. FastMCP tool processes", 18)
 
         # Step 3: Get dialog history
-        step3 = Rectangle(width=4, height=0.8, color=ORANGE).set_fill(ORANGE, opacity=0.2)
-        step3_text = Text("3. Retrieve dialog from DB", font_size=18)
-        step3_group = VGroup(step3, step3_text)
+        step3_group = boxed_label(ORANGE, 4, 0.8, "3. Retrieve dialog from DB", 18)
 
         # Step 4: Construct prompt
-        step4 = Rectangle(width=4, height=0.8, color=PURPLE).set_fill(PURPLE, opacity=0.2)
-        step4_text = Text("4. Build AI prompt", font_size=18)
-        step4_group = VGroup(step4, step4_text)
+        step4_group = boxed_label(PURPLE, 4, 0.8, "4. Build AI prompt", 18)
 
         # Step 5: Generate response
-        step5 = Rectangle(width=4, height=0.8, color=PURPLE).set_fill(PURPLE, opacity=0.2)
-        step5_text = Text("5. AI generates response", font_size=18)
-        step5_group = VGroup(step5, step5_text)
+        step5_group = boxed_label(PURPLE, 4, 0.8, "5. AI generates response", 18)
 
         # Step 6: Save dialog
-        step6 = Rectangle(width=4, height=0.8, color=RED).set_fill(RED, opacity=0.2)
-        step6_text = Text("6. Update dialog in DB", font_size=18)
-        step6_group = VGroup(step6, step6_text)
+        step6_group = boxed_label(RED, 4, 0.8, "6. Update dialog in DB", 18)
 
         # Step 7: Return response
-        step7 = Rectangle(width=4, height=0.8, color=TEAL).set_fill(TEAL, opacity=0.2)
-        step7_text = Text("7. Return AI response", font_size=18)
-        step7_group = VGroup(step7, step7_text)
+        step7_group = boxed_label(TEAL, 4, 0.8, "7. Return AI response", 18)
 
         # Arrange steps vertically
         all_steps = VGroup(step1_group, step2_group, step3_group, step4_group,
@@ -186,9 +168,13 @@ class MCPWaifuChatExplanation(Scene):
 
         # Highlight the flow (this will work on the scaled version)
         self.wait(2)
-        for i in range(len(all_steps)):
-            self.play(all_steps[i].animate.scale(1.1), run_time=0.3)
-            self.play(all_steps[i].animate.scale(1/1.1), run_time=0.3)
+        # One timeline instead of a play() per pulse. ScaleInPlace builds its
+        # target when it starts, so each shrink undoes the preceding grow.
+        pulses = []
+        for step in all_steps:
+            pulses.append(ScaleInPlace(step, 1.1, run_time=0.3))
+            pulses.append(ScaleInPlace(step, 1/1.1, run_time=0.3))
+        self.play(Succession(*pulses))
 
         self.wait(2)
         self.play(FadeOut(section_title), FadeOut(full_diagram))
@@ -202,19 +188,13 @@ class MCPWaifuChatExplanation(Scene):
         # --- Construct all components FIRST, without animating ---
 
         # Provider selection logic
-        provider_logic = Rectangle(width=6, height=1.5, color=PURPLE).set_fill(PURPLE, opacity=0.2)
-        provider_text = Text("Provider Selection Logic", font_size=20)
-        provider_group = VGroup(provider_logic, provider_text)
+        provider_group = boxed_label(PURPLE, 6, 1.5, "Provider Selection Logic", 20)
 
         # OpenRouter branch
-        openrouter_box = Rectangle(width=3, height=1, color=PURPLE).set_fill(PURPLE, opacity=0.2)
-        openrouter_label = Text("OpenRouter (Default)", font_size=16)
-        openrouter_group = VGroup(openrouter_box, openrouter_label).next_to(provider_group, DOWN, buff=1)
+        openrouter_group = boxed_label(PURPLE, 3, 1, "OpenRouter (Default)", 16).next_to(provider_group, DOWN, buff=1)
 
         # Gemini branch
-        gemini_box = Rectangle(width=3, height=1, color=TEAL).set_fill(TEAL, opacity=0.2)
-        gemini_label = Text("Gemini (Fallback)", font_size=16)
-        gemini_group = VGroup(gemini_box, gemini_label).next_to(openrouter_group, RIGHT, buff=1)
+        gemini_group = boxed_label(TEAL, 3, 1, "Gemini (Fallback)", 16).next_to(openrouter_group, RIGHT, buff=1)
 
         # Configuration sources
         config_sources = VGroup()
@@ -291,17 +271,13 @@ class MCPWaifuChatExplanation(Scene):
                "reset_user_chat", "is_user_id_in_db", "delete_user_from_db"]
 
         for i, op in enumerate(ops):
-            op_box = Rectangle(width=2.5, height=0.6, color=BLUE_B).set_fill(BLUE_B, opacity=0.3)
-            op_text = Text(op, font_size=14)
-            op_group = VGroup(op_box, op_text)
+            op_group = boxed_label(BLUE_B, 2.5, 0.6, op, 14, opacity=0.3)
             operations.add(op_group)
 
         operations.arrange_in_grid(rows=3, cols=2, buff=0.3).next_to(schema_group, RIGHT, buff=1)
 
         # Connection pooling
-        conn_pool = Rectangle(width=3, height=0.8, color=GREEN).set_fill(GREEN, opacity=0.3)
-        conn_text = Text("Connection Pooling", font_size=16)
-        conn_group = VGroup(conn_pool, conn_text).next_to(schema_group, DOWN, buff=1)
+        conn_group = boxed_label(GREEN, 3, 0.8, "Connection Pooling", 16, opacity=0.3).next_to(schema_group, DOWN, buff=1)
 
         # --- Create the MASTER GROUP ---
         full_diagram = VGroup(schema_group, operations, conn_group)
@@ -326,26 +302,18 @@ class MCPWaifuChatExplanation(Scene):
         sources = VGroup()
 
         # Environment variables
-        env_box = Rectangle(width=3, height=1, color=GREEN).set_fill(GREEN, opacity=0.2)
-        env_label = Text("Environment Variables", font_size=16)
-        env_group = VGroup(env_box, env_label)
+        env_group = boxed_label(GREEN, 3, 1, "Environment Variables", 16)
 
         # .env file
-        dotenv_box = Rectangle(width=3, height=1, color=BLUE).set_fill(BLUE, opacity=0.2)
-        dotenv_label = Text(".env File", font_size=16)
-        dotenv_group = VGroup(dotenv_box, dotenv_label).next_to(env_group, RIGHT, buff=1)
+        dotenv_group = boxed_label(BLUE, 3, 1, ".env File", 16).next_to(env_group, RIGHT, buff=1)
 
         # Dotfiles
-        dotfile_box = Rectangle(width=3, height=1, color=PURPLE).set_fill(PURPLE, opacity=0.2)
-        dotfile_label = Text("Dotfiles (~/.api-*, ~/.model-*)", font_size=16)
-        dotfile_group = VGroup(dotfile_box, dotfile_label).next_to(env_group, DOWN, buff=1)
+        dotfile_group = boxed_label(PURPLE, 3, 1, "Dotfiles (~/.api-*, ~/.model-*)", 16).next_to(env_group, DOWN, buff=1)
 
         # Default values
-        default_box = Rectangle(width=3, height=1, color=ORANGE).set_fill(ORANGE, opacity=0.2)
-        default_label = Text("Default Values", font_size=16)
-        default_group = VGroup(default_box, default_label).next_to(dotfile_group, RIGHT, buff=1)
+        default_group = boxed_label(ORANGE, 3, 1, "Default Values", 16).next_to(dotfile_group, RIGHT, buff=1)
 
-        sources.add(env_group, dotenv_box, dotfile_box, default_box)
+        sources.add(env_group, dotenv_group, dotfile_group, default_group)
 
         # Priority arrows
         arrow1 = Arrow(env_group.get_right(), dotenv_group.get_left(), color=YELLOW, stroke_width=4)
@@ -417,5 +385,117 @@ class MCPWaifuChatExplanation(Scene):
 
         self.play(FadeOut(conclusion_title), FadeOut(features), FadeOut(final_msg))
 
+class MCPWaifuChatExplanation(WaifuChatSections, Scene):
+    def construct(self):
+        # Title
+        self.show_title()
+
+        # Architecture Overview
+        self.show_architecture()
+
+        # Data Flow
+        self.show_data_flow()
+
+        # AI Provider System
+        self.show_ai_providers()
+
+        # Database System
+        self.show_database_system()
+
+        # Configuration System
+        self.show_config_system()
+
+        # Conclusion
+        self.show_conclusion()
+
+
+# --- One scene per section, so the sections can be rendered in parallel ---
+class TitleScene(WaifuChatSections, Scene):
+    def construct(self):
+        self.show_title()
+
+
+class ArchitectureScene(WaifuChatSections, Scene):
+    def construct(self):
+        self.show_architecture()
+
+
+class DataFlowScene(WaifuChatSections, Scene):
+    def construct(self):
+        self.show_data_flow()
+
+
+class AIProvidersScene(WaifuChatSections, Scene):
+    def construct(self):
+        self.show_ai_providers()
+
+
+class DatabaseSystemScene(WaifuChatSections, Scene):
+    def construct(self):
+        self.show_database_system()
+
+
+class ConfigSystemScene(WaifuChatSections, Scene):
+    def construct(self):
+        self.show_config_system()
+
+
+class ConclusionScene(WaifuChatSections, Scene):
+    def construct(self):
+        self.show_conclusion()
+
+
+SECTION_SCENES = [
+    "TitleScene",
+    "ArchitectureScene",
+    "DataFlowScene",
+    "AIProvidersScene",
+    "DatabaseSystemScene",
+    "ConfigSystemScene",
+    "ConclusionScene",
+]
+
+# Output folder manim uses for each quality flag
+QUALITY_DIRS = {"l": "480p15", "m": "720p30", "h": "1080p60", "p": "1440p60", "k": "2160p60"}
+
+
+def _render_one(job):
+    """Render a single section scene in its own manim process."""
+    index, scene_name, quality = job
+    subprocess.run(
+        ["manim", f"-q{quality}", "--output_file", f"part_{index}.mp4", __file__, scene_name],
+        check=True,
+    )
+
+
+def render_parallel(quality="l", output="MCPWaifuChatExplanation.mp4"):
+    """Render every section concurrently and stitch the parts with ffmpeg.
+
+    Each worker only waits on a manim subprocess, so a thread pool is enough
+    to keep up to one render process per CPU busy.
+    """
+    jobs = [(i, name, quality) for i, name in enumerate(SECTION_SCENES)]
+    with ThreadPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+        list(pool.map(_render_one, jobs))
+
+    video_dir = Path("media") / "videos" / Path(__file__).stem / QUALITY_DIRS[quality]
+    parts_file = video_dir / "parts.txt"
+    parts_file.write_text(
+        "".join(f"file 'part_{i}.mp4'\n" for i in range(len(jobs))), encoding="utf-8"
+    )
+    # All parts share codec, resolution and frame rate, so they can be joined
+    # with stream copy instead of re-encoding
+    subprocess.run(
+        ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(parts_file),
+         "-c", "copy", str(video_dir / output)],
+        check=True,
+    )
+
+
 # To run this animation:
-# manim -pql manim-animation.py MCPWaifuChatExplanation
\ No newline at end of file
+# manim -pql manim-animation.py MCPWaifuChatExplanation
+#
+# To render the sections in parallel and concatenate them:
+# python manim-animation.py [l|m|h|p|k]
+if __name__ == "__main__":
+    render_parallel(sys.argv[1] if len(sys.argv) > 1 else "l")
\ No newline at end of file
@@ -11,50 +11,182 @@ The module includes:
 - Timeout and retry logic for external API calls
 """
 
+import asyncio
+import hashlib
 import logging
 import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Optional
 
-import requests
-from .config import Config
+import httpx
+import orjson
+from .config import Config, Provider, read_single_line_file
 
 logger = logging.getLogger(__name__)
 
 # --- OpenRouter constants ---
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
-_OPENROUTER_API_KEY: Optional[str] = None
+_HOME = Path.home()
 
+_BASE_HEADERS = {"Content-Type": "application/json"}
+# Full request headers for the most recently used key, rebuilt only when the key changes
+_HEADERS_CACHE: Optional[tuple[str, dict[str, str]]] = None
+
+# Rate-limit and transient upstream errors are retried with exponential backoff
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_MAX_RETRIES = 3
+_BACKOFF_FACTOR = 0.5
+
+# In-flight completions keyed by (model, prompt); identical concurrent prompts share one call
+_IN_FLIGHT: dict[tuple[str, str], "asyncio.Task[Optional[str]]"] = {}
+
+# Recent completions keyed by blake2b(model|prompt), stored as (expires_at, text)
+_RESPONSE_CACHE: "OrderedDict[bytes, tuple[float, str]]" = OrderedDict()
+
+# Shared client so concurrent chats reuse pooled keep-alive connections
+_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+
+# Upper bound on in-flight OpenRouter requests, leaving headroom under rate limits
+_MAX_CONCURRENT_REQUESTS = 8
+_REQUEST_SLOTS: Optional[asyncio.Semaphore] = None
 
-def _read_single_line_file(path: Path) -> Optional[str]:
-    try:
-        if path.is_file():
-            content = path.read_text(encoding="utf-8").strip()
-            return content if content else None
-    except Exception:
-        return None
-    return None
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Returns the shared AsyncClient, creating it on first use."""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+        # The transport also retries failed connection attempts
+        _HTTP_CLIENT = httpx.AsyncClient(
+            timeout=60,
+            transport=httpx.AsyncHTTPTransport(
+                retries=_MAX_RETRIES,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+            ),
+        )
+    return _HTTP_CLIENT
+
+
+def _get_request_slots() -> asyncio.Semaphore:
+    """Returns the semaphore that bounds concurrent OpenRouter requests."""
+    global _REQUEST_SLOTS
+    if _REQUEST_SLOTS is None:
+        _REQUEST_SLOTS = asyncio.Semaphore(_MAX_CONCURRENT_REQUESTS)
+    return _REQUEST_SLOTS
+
+
+async def aclose() -> None:
+    """Closes the shared AsyncClient; the next request opens a new one."""
+    global _HTTP_CLIENT, _REQUEST_SLOTS
+    _REQUEST_SLOTS = None
+    if _HTTP_CLIENT is not None:
+        client, _HTTP_CLIENT = _HTTP_CLIENT, None
+        await client.aclose()
 
 
 # ---------------- OpenRouter helpers ----------------
 def _resolve_openrouter_api_key() -> Optional[str]:
-    """OPENROUTER_API_KEY env takes precedence; then ~/.api-openrouter."""
-    global _OPENROUTER_API_KEY
-    if _OPENROUTER_API_KEY is not None:
-        return _OPENROUTER_API_KEY
+    """OPENROUTER_API_KEY env takes precedence; then ~/.api-openrouter.
+
+    The dotfile is cached by mtime, so a rotated key is picked up without a restart.
+    """
     env_key = os.getenv("OPENROUTER_API_KEY")
     if env_key and env_key.strip():
-        _OPENROUTER_API_KEY = env_key.strip()
-        return _OPENROUTER_API_KEY
-    file_key = _read_single_line_file(Path.home() / ".api-openrouter")
+        return env_key.strip()
+    file_key = read_single_line_file(_HOME / ".api-openrouter")
     if file_key:
-        _OPENROUTER_API_KEY = file_key
-        return _OPENROUTER_API_KEY
+        return file_key
     logger.error("No OpenRouter API key found in OPENROUTER_API_KEY or ~/.api-openrouter")
     return None
 
 
-def _openrouter_chat(prompt: str, model_name: str, timeout: int = 60) -> Optional[str]:
+def _openrouter_headers(api_key: str) -> dict[str, str]:
+    """Returns the request headers for api_key, reusing them while the key is unchanged."""
+    global _HEADERS_CACHE
+    if _HEADERS_CACHE is None or _HEADERS_CACHE[0] != api_key:
+        _HEADERS_CACHE = (api_key, {"Authorization": f"Bearer {api_key}", **_BASE_HEADERS})
+    return _HEADERS_CACHE[1]
+
+
+@asynccontextmanager
+async def _stream_with_retries(body: bytes, headers: dict) -> AsyncIterator[httpx.Response]:
+    """Opens a streamed POST to OpenRouter, retrying rate-limited and transient 5xx responses."""
+    for attempt in range(_MAX_RETRIES + 1):
+        async with _get_http_client().stream(
+            "POST", OPENROUTER_API_URL, headers=headers, content=body
+        ) as resp:
+            if resp.status_code not in _RETRY_STATUSES or attempt == _MAX_RETRIES:
+                yield resp
+                return
+        delay = _BACKOFF_FACTOR * (2 ** attempt)
+        logger.info(f"OpenRouter returned {resp.status_code}; retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+def _extract_delta(chunk: dict) -> Optional[tuple[Optional[str], Optional[str]]]:
+    """Returns (content, finish_reason) for the first choice of a stream chunk.
+
+    Returns None when the chunk does not have the shape of a completion delta.
+    """
+    choices = chunk.get("choices")
+    if not isinstance(choices, list) or not choices or not isinstance(choices[0], dict):
+        return None
+    choice = choices[0]
+    delta = choice.get("delta", {})
+    if not isinstance(delta, dict):
+        return None
+    content = delta.get("content")
+    if content is not None and not isinstance(content, str):
+        return None
+    finish_reason = choice.get("finish_reason")
+    return content, finish_reason if isinstance(finish_reason, str) else None
+
+
+async def _collect_stream(resp: httpx.Response) -> Optional[str]:
+    """Accumulates the streamed delta content until the first choice finishes.
+
+    The body is always read to the end, even after the completion is done, so
+    the connection goes back to the pool instead of being closed.
+    """
+    parts: list[str] = []
+    finished = failed = False
+    async for line in resp.aiter_lines():
+        # Skip blank separators, SSE comments (OpenRouter keep-alives) and the tail
+        if finished or not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            finished = True
+            continue
+        try:
+            chunk = orjson.loads(data)
+        except orjson.JSONDecodeError:
+            logger.warning(f"Skipping undecodable OpenRouter chunk: {data[:200]}")
+            continue
+        if not isinstance(chunk, dict):
+            logger.warning(f"Skipping malformed OpenRouter chunk: {data[:200]}")
+            continue
+        if "error" in chunk:
+            logger.warning(f"OpenRouter stream error: {chunk['error']}")
+            finished = failed = True
+            continue
+        delta = _extract_delta(chunk)
+        if delta is None:
+            logger.warning(f"Skipping malformed OpenRouter chunk: {data[:200]}")
+            continue
+        content, finish_reason = delta
+        if content:
+            parts.append(content)
+        if finish_reason:
+            finished = True
+    if failed:
+        return None
+    return "".join(parts).strip() or None
+
+
+async def _openrouter_chat(prompt: str, model_name: str) -> Optional[str]:
     api_key = _resolve_openrouter_api_key()
     if not api_key:
         return None
@@ -63,39 +195,105 @@ def _openrouter_chat(prompt: str, model_name: str, timeout: int = 60) -> Optiona
         "model": model_name,
         "messages": [{"role": "user", "content": prompt}],
         "temperature": 0.0,
+        "stream": True,
     }
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
+    headers = _openrouter_headers(api_key)
     try:
-        resp = requests.post(OPENROUTER_API_URL, headers=headers, json=payload, timeout=timeout)
-        if resp.status_code != 200:
-            try:
-                body = resp.text
-            except Exception:
-                body = "<unavailable>"
-            logger.warning(f"OpenRouter non-200: {resp.status_code}: {body[:500]}")
-            return None
-        data = resp.json()
-        choices = data.get("choices", [])
-        if not choices:
-            return None
-        content = (choices[0].get("message", {}).get("content") or "").strip()
-        return content or None
-    except Exception as e:
+        async with _get_request_slots(), _stream_with_retries(orjson.dumps(payload), headers) as resp:
+            if resp.status_code != 200:
+                try:
+                    body = (await resp.aread()).decode("utf-8", errors="replace")
+                except httpx.HTTPError:
+                    body = "<unavailable>"
+                logger.warning(f"OpenRouter non-200: {resp.status_code}: {body[:500]}")
+                return None
+            return await _collect_stream(resp)
+    except httpx.HTTPError as e:
         logger.exception(f"OpenRouter request failed: {e}")
         return None
 
 
-# ---------------- Unified interface ----------------
-async def generate_response(prompt: str, config: Config) -> str:
-    """
-    Generates a response from OpenRouter.
+async def _coalesced_openrouter_chat(prompt: str, model_name: str) -> Optional[str]:
+    """Joins an identical in-flight request instead of issuing a second upstream call.
+
+    Prompts are sent with temperature 0, so concurrent callers with the same
+    prompt and model can share one completion. The shared task is shielded so
+    a cancelled caller does not cancel it for the others.
     """
+    key = (model_name, prompt)
+    task = _IN_FLIGHT.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_openrouter_chat(prompt, model_name=model_name))
+        _IN_FLIGHT[key] = task
+        task.add_done_callback(lambda _: _IN_FLIGHT.pop(key, None))
+    return await asyncio.shield(task)
+
+
+# ---------------- Response cache ----------------
+def _response_cache_key(model_name: str, prompt: str) -> bytes:
+    return hashlib.blake2b(f"{model_name}|{prompt}".encode("utf-8"), digest_size=16).digest()
+
+
+def _get_cached_response(key: bytes) -> Optional[str]:
+    """Returns a cached response that has not expired, refreshing its LRU position."""
+    entry = _RESPONSE_CACHE.get(key)
+    if entry is None:
+        return None
+    if entry[0] < time.monotonic():
+        del _RESPONSE_CACHE[key]
+        return None
+    _RESPONSE_CACHE.move_to_end(key)
+    return entry[1]
+
+
+def _store_response(key: bytes, text: str, config: Config) -> None:
+    """Caches text for config.response_cache_ttl seconds, evicting the oldest entries."""
+    if config.response_cache_size <= 0:
+        return
+    _RESPONSE_CACHE[key] = (time.monotonic() + config.response_cache_ttl, text)
+    _RESPONSE_CACHE.move_to_end(key)
+    while len(_RESPONSE_CACHE) > config.response_cache_size:
+        _RESPONSE_CACHE.popitem(last=False)
+
+
+async def _generate_openrouter(prompt: str, config: Config) -> str:
     model = config.openrouter_model_name
-    text = _openrouter_chat(prompt, model_name=model)
+    key = _response_cache_key(model, prompt)
+    text = _get_cached_response(key)
     if text:
         return text
+    text = await _coalesced_openrouter_chat(prompt, model_name=model)
+    if text:
+        _store_response(key, text, config)
+        return text
     logger.warning("OpenRouter failed or returned empty text; using default response.")
     return config.default_response
+
+
+async def warmup(config: Config) -> None:
+    """Resolves the API key and opens a pooled connection to OpenRouter.
+
+    Called at server startup so the first chat does not pay for DNS, TCP and
+    TLS setup. Failures are logged and otherwise ignored.
+    """
+    if config.default_provider is not Provider.OPENROUTER:
+        return
+    if not _resolve_openrouter_api_key():
+        return
+    try:
+        await _get_http_client().head(OPENROUTER_API_URL, timeout=5)
+    except httpx.HTTPError as e:
+        logger.warning(f"OpenRouter warmup failed: {e}")
+
+
+# ---------------- Unified interface ----------------
+_PROVIDERS = {
+    Provider.OPENROUTER: _generate_openrouter,
+}
+
+
+async def generate_response(prompt: str, config: Config) -> str:
+    """
+    Generates a response from the configured provider.
+    """
+    return await _PROVIDERS[config.default_provider](prompt, config)
@@ -15,18 +15,52 @@ The server uses FastMCP for automatic MCP protocol compliance and provides
 a clean, extensible API for waifu character interactions.
 """
 
+import asyncio
+import contextlib
 import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 
 from mcp.server.fastmcp import FastMCP
 from mcp.server.fastmcp import Context
 # Remove Request import as it's not needed for tools
 # from starlette.requests import Request
 
-from . import ai, config, db, models, utils
+from . import ai, db, utils
 from .config import Config
 
 # --- Configuration and Logging ---
-app = FastMCP(name="WaifuAPI")  # Use FastMCP!
+_active_sessions = 0
+_warmup_task: Optional["asyncio.Task[None]"] = None
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Warms up the AI provider connection and closes it after the last session ends.
+
+    FastMCP enters the lifespan once per session (once per process for stdio,
+    once per connection for SSE), so the shared HTTP client is reference counted.
+    Only the first session starts the warmup, in the background, so no session
+    waits on it.
+    """
+    global _active_sessions, _warmup_task
+    _active_sessions += 1
+    if _active_sessions == 1:
+        _warmup_task = asyncio.ensure_future(ai.warmup(server.config))
+    try:
+        yield
+    finally:
+        _active_sessions -= 1
+        if _active_sessions == 0:
+            task, _warmup_task = _warmup_task, None
+            if task is not None and not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+            await ai.aclose()
+
+
+app = FastMCP(name="WaifuAPI", lifespan=lifespan)  # Use FastMCP!
 config = Config.load()
 
 logging.basicConfig(
@@ -36,17 +70,26 @@ logger = logging.getLogger(__name__)  # Use __name__ for module-level logging
 
 
 # --- Database Initialization ---
-# Initialize database tables directly after loading config
-db.create_tables(config)
+# Bind the database file and create tables directly after loading config
+db.init(config.database_file, cache_reads=config.db_read_cache)
+db.create_tables()
 app.config = config # Assign config to app *after* potential use in create_tables
 
 
 # --- Helper Functions (remain largely the same, but now use config)---
+# Reported when a request carries no "current-user" header
+_DEFAULT_CURRENT_USER = "0_no_current_user_specified"
+
+
 # Simplify helper back to expecting request_context (which has meta.headers)
 def _get_current_user(request_context) -> str:
     """Helper function to consistently get the current user from request context."""
-    headers = getattr(request_context, 'meta', {}).get('headers', {})
-    return headers.get("current-user", "0_no_current_user_specified")
+    meta = getattr(request_context, 'meta', None)
+    # meta is a pydantic model from MCP requests, but may also be a plain dict
+    headers = meta.get('headers') if isinstance(meta, dict) else getattr(meta, 'headers', None)
+    if not headers:
+        return _DEFAULT_CURRENT_USER
+    return headers.get("current-user", _DEFAULT_CURRENT_USER)
 
 
 # --- User Management (now using FastMCP decorators) ---
@@ -54,7 +97,7 @@ def _get_current_user(request_context) -> str:
 async def create_user(user_id: str, context: Context) -> dict:
     """Creates a new user."""
     current_user = _get_current_user(context.request_context) # Pass request_context
-    db.add_user_to_db(current_user, user_id, app.config)
+    await db.aadd_user_to_db(current_user, user_id)
     logger.info(f"Created user: {user_id} for current_user: {current_user}")
     return {"user_id": user_id}
 
@@ -63,7 +106,7 @@ async def create_user(user_id: str, context: Context) -> dict:
 async def check_user(user_id: str, context: Context) -> dict:
     """Checks if a user exists."""
     current_user = _get_current_user(context.request_context) # Pass request_context
-    exists = db.is_user_id_in_db(current_user, user_id, app.config)
+    exists = await db.ais_user_id_in_db(current_user, user_id)
     return {"user_id": user_id, "exists": exists}
 
 
@@ -71,7 +114,7 @@ async def check_user(user_id: str, context: Context) -> dict:
 async def delete_user(user_id: str, context: Context) -> dict:
     """Deletes a user."""
     current_user = _get_current_user(context.request_context) # Pass request_context
-    db.delete_user_from_db(current_user, user_id, app.config)
+    await db.adelete_user_from_db(current_user, user_id)
     logger.info(f"Deleted user: {user_id} for current_user: {current_user}")
     return {"user_id": user_id}
 
@@ -80,7 +123,7 @@ async def delete_user(user_id: str, context: Context) -> dict:
 async def user_count(context: Context) -> dict:
     """Gets the total number of users."""
     current_user = _get_current_user(context.request_context) # Pass request_context
-    count = db.get_user_count(current_user, app.config)
+    count = await db.aget_user_count(current_user)
     return {"user_count": count}
 
 
@@ -89,7 +132,7 @@ async def user_count(context: Context) -> dict:
 async def reset_dialog(user_id: str, context: Context) -> dict:
     """Resets the user's dialog history."""
     current_user = _get_current_user(context.request_context) # Pass request_context
-    db.reset_user_chat(current_user, user_id, app.config)
+    await db.areset_user_chat(current_user, user_id)
     logger.info(f"Reset dialog for user: {user_id} by current_user: {current_user}")
     return {"user_id": user_id}
 
@@ -99,7 +142,7 @@ async def reset_dialog(user_id: str, context: Context) -> dict:
 async def get_dialog_json(user_id: str, context: Context) -> dict: # Changed signature back
     """Gets the user's dialog history as a JSON object."""
     current_user = _get_current_user(context.request_context) # Use context
-    dialog_str = db.get_user_dialog(current_user, user_id, app.config)
+    dialog_str = await db.aget_user_dialog(current_user, user_id)
     dialog_list = utils.dialog_to_json(dialog_str)
     return {"user_id": user_id, "dialog": dialog_list}
 
@@ -108,7 +151,7 @@ async def get_dialog_json(user_id: str, context: Context) -> dict: # Changed sig
 async def get_dialog_str(user_id: str, context: Context) -> dict: # Changed signature back
     """Gets the user's dialog history as a string."""
     current_user = _get_current_user(context.request_context) # Use context
-    dialog_str = db.get_user_dialog(current_user, user_id, app.config)
+    dialog_str = await db.aget_user_dialog(current_user, user_id)
     return {"user_id": user_id, "dialog": dialog_str}
 
 
@@ -119,20 +162,21 @@ async def chat(message: str, user_id: str, context: Context) -> dict:
     current_user = _get_current_user(context.request_context) # Pass request_context
 
     # 1. Get old dialog
-    old_dialog = db.get_old_dialog(current_user, user_id, app.config)
+    old_dialog = await db.aget_old_dialog(current_user, user_id)
 
-    # 2. Construct the prompt including the new message
-    prompt_dialog = f'{old_dialog} User said: "{message}" Waifu said: "'
+    # 2. Construct the prompt from the most recent turns plus the new message
+    recent_dialog = utils.truncate_dialog(old_dialog, app.config.max_dialog_turns)
+    prompt_dialog = f'{recent_dialog} User said: "{message}" Waifu said: "'
 
    # 3. Generate the AI response using the constructed prompt
     # Use the actual generate_response function and pass the correct prompt and config
     ai_response = await ai.generate_response(prompt_dialog, app.config)
 
-    # 4. Construct the complete dialog string including the AI's response
-    complete_dialog = f'{prompt_dialog}{ai_response}"'
+    # 4. Construct the new turn including the AI's response
+    new_turn = f' User said: "{message}" Waifu said: "{ai_response}"'
 
-   # 5. Update the database with the complete dialog
-    db.update_user_dialog(current_user=current_user, user_id=user_id, dialog=complete_dialog, config=app.config)
+   # 5. Append the new turn to the stored dialog
+    await db.aappend_user_dialog(current_user=current_user, user_id=user_id, turn=new_turn)
 
    # 6. Return the AI's response
     return {"user_id": user_id, "response": ai_response}
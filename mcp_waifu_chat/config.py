@@ -18,21 +18,45 @@ Features:
 - Frozen configuration to prevent runtime modifications
 """
 
+import logging
 import os
+from enum import Enum
+from functools import lru_cache
 from pathlib import Path
 
-from pydantic import Field
+from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+logger = logging.getLogger(__name__)
 
-def _read_single_line_file(path: Path) -> str | None:
+# Dotfile contents keyed by path, stored with the st_mtime_ns they were read at
+_FILE_CACHE: dict[str, tuple[int, str | None]] = {}
+
+
+def read_single_line_file(path: Path) -> str | None:
+    """Reads a single-line dotfile, re-reading it only when its mtime changes."""
     try:
-        if path.is_file():
-            content = path.read_text(encoding="utf-8").strip()
-            return content if content else None
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    key = str(path)
+    cached = _FILE_CACHE.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    try:
+        # Dotfiles hold a single short line; a raw read skips text-mode setup
+        with open(path, "rb") as f:
+            content = f.read(4096).strip().decode("utf-8") or None
     except Exception:
         return None
-    return None
+    _FILE_CACHE[key] = (mtime, content)
+    return content
+
+
+class Provider(str, Enum):
+    """AI providers that generate_response can dispatch to."""
+
+    OPENROUTER = "openrouter"
 
 
 class Config(BaseSettings):
@@ -58,19 +82,65 @@ class Config(BaseSettings):
     )
 
     # Provider and model settings
+    default_provider: Provider = Field(
+        default=Provider.OPENROUTER,
+        description="The AI provider used to generate responses.",
+    )
     openrouter_model_name: str = Field(
         default="openrouter/free",
         description="The specific OpenRouter model to use.",
     )
 
+    # Response cache settings
+    response_cache_size: int = Field(
+        default=256,
+        description="Maximum number of AI responses kept in memory (0 disables the cache).",
+    )
+    response_cache_ttl: int = Field(
+        default=300, description="Seconds a cached AI response stays valid."
+    )
+
+    # Database settings
+    db_read_cache: bool = Field(
+        default=False,
+        description="Cache dialog and user-existence reads in memory. Only safe when a "
+        "single server process uses the database.",
+    )
+
+    # Prompt settings
+    max_dialog_turns: int = Field(
+        default=20,
+        description="Most recent dialog turns sent to the AI model (0 sends the full history).",
+    )
+
     # Add model_url to config (kept for compatibility)
     model_url: str = Field(default="http://example.com", description="ai model url")
 
+    @field_validator("default_provider", mode="before")
     @classmethod
+    def normalize_provider(cls, value: object) -> object:
+        """Accepts provider names case-insensitively and with surrounding spaces.
+
+        Unknown providers (e.g. a leftover DEFAULT_PROVIDER=gemini) fall back to
+        OpenRouter with a warning instead of failing at startup.
+        """
+        if isinstance(value, str):
+            value = value.strip().lower()
+            if value not in Provider._value2member_map_:
+                logger.warning(
+                    f"Unknown provider {value!r}; falling back to {Provider.OPENROUTER.value!r}"
+                )
+                return Provider.OPENROUTER
+        return value
+
+    @classmethod
+    @lru_cache(maxsize=1)
     def load(cls) -> "Config":
         """
         Loads the configuration from environment variables and/or a .env file,
         then applies dotfile-based overrides for model names.
+
+        The result is cached; call Config.load.cache_clear() to re-read the sources.
         """
         cfg = cls()
 
@@ -80,7 +150,7 @@ class Config(BaseSettings):
         if openrouter_env and openrouter_env.strip():
             object.__setattr__(cfg, "openrouter_model_name", openrouter_env.strip())
         else:
-            or_file = _read_single_line_file(Path.home() / ".model-openrouter")
+            or_file = read_single_line_file(Path.home() / ".model-openrouter")
             if or_file:
                 object.__setattr__(cfg, "openrouter_model_name", or_file)
 
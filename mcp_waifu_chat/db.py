@@ -11,11 +11,16 @@ Database Operations:
 - Pagination support for large user lists
 
 Features:
-- Connection pooling with context managers
+- Shared long-lived connection (WAL mode) behind a context manager
 - Automatic table creation and schema management
 - Comprehensive error handling and logging
 - Transaction rollback on failures
+- Optional LRU caches for dialog and user-existence reads, invalidated on
+  writes. They are per process, so only enable them when a single server
+  process owns the database (not with several Gunicorn workers).
 - Efficient query optimization
+- Async wrappers that run queries on a worker thread pool
+- Coalescing of concurrent dialog appends into batched transactions
 - Timestamp tracking for audit trails
 
 The database schema includes a single 'dialogs' table that stores user conversations
@@ -25,179 +30,410 @@ with proper indexing for efficient lookups.
 import datetime
 import logging
 import sqlite3
+import threading
 import time
+from collections import OrderedDict
 from contextlib import contextmanager
-from typing import Generator
+from typing import Callable, Generator, Optional, TypeVar
 
-from .config import Config
+import anyio
+from anyio.lowlevel import RunVar
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 
-@contextmanager
-def get_db_connection(db_file: str) -> Generator[sqlite3.Connection, None, None]:
-    """Context manager for database connections with connection pooling."""
-    conn = sqlite3.connect(db_file, timeout=10)  # Increased timeout
+# SQL statements, kept as constants so every call passes the identical text
+# and hits the connection's prepared-statement cache.
+_SQL_CREATE_DIALOGS = """
+    CREATE TABLE IF NOT EXISTS dialogs (
+        current_user TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        dialog TEXT,
+        last_modified_datetime TEXT,  -- legacy; derived from the timestamp on read
+        last_modified_timestamp INTEGER,
+        PRIMARY KEY (current_user, user_id)
+    )
+"""
+# Lets paged listings read rows pre-sorted instead of sorting per page
+_SQL_CREATE_USER_MTIME_INDEX = (
+    "CREATE INDEX IF NOT EXISTS idx_dialogs_user_mtime "
+    "ON dialogs (current_user, last_modified_timestamp DESC)"
+)
+_SQL_GET_DIALOG = "SELECT dialog FROM dialogs WHERE current_user=? AND user_id=?"
+_SQL_SET_DIALOG = (
+    "UPDATE dialogs SET dialog=?, last_modified_timestamp=? "
+    "WHERE current_user=? AND user_id=?"
+)
+_SQL_APPEND_DIALOG = (
+    "UPDATE dialogs SET dialog=COALESCE(dialog, '') || ?, last_modified_timestamp=? "
+    "WHERE current_user=? AND user_id=?"
+)
+_SQL_USER_EXISTS = "SELECT 1 FROM dialogs WHERE current_user=? AND user_id=?"
+_SQL_ADD_USER = (
+    "INSERT INTO dialogs (current_user, user_id, dialog, "
+    "last_modified_timestamp) VALUES (?, ?, ?, ?)"
+)
+_SQL_DELETE_USER = "DELETE FROM dialogs WHERE current_user=? AND user_id=?"
+_SQL_COUNT_USERS = "SELECT COUNT(*) FROM dialogs WHERE current_user=?"
+_SQL_ALL_USERS = "SELECT user_id FROM dialogs WHERE current_user=?"
+_SQL_USERS_PAGE = (
+    "SELECT user_id FROM dialogs WHERE current_user=? "
+    "ORDER BY last_modified_timestamp DESC LIMIT ?, 100"
+)
+_SQL_GET_TIMESTAMP = (
+    "SELECT last_modified_timestamp FROM dialogs WHERE current_user=? AND user_id=?"
+)
+
+
+# One long-lived connection to the database file given to init(), shared across threads.
+# The lock serializes use so each caller gets its own transaction.
+_DB_FILE: Optional[str] = None
+_CONNECTION: Optional[sqlite3.Connection] = None
+_CONNECTION_LOCK = threading.RLock()
+
+# Read caches keyed by (current_user, user_id), enabled by init(cache_reads=True).
+# They are only touched while holding _CONNECTION_LOCK, and every write to a row
+# drops its entries; writes from other processes are not seen.
+_CACHE_READS = False
+_READ_CACHE_SIZE = 4096
+_DIALOG_CACHE: "OrderedDict[tuple[str, str], str]" = OrderedDict()
+_EXISTS_CACHE: "OrderedDict[tuple[str, str], bool]" = OrderedDict()
+
+
+def _open_connection(db_file: str) -> sqlite3.Connection:
+    """Opens a connection tuned for many small transactions."""
+    # "file:" URIs allow e.g. shared in-memory databases
+    conn = sqlite3.connect(
+        db_file, timeout=10, check_same_thread=False, uri=db_file.startswith("file:")
+    )
     conn.row_factory = sqlite3.Row  # Use Row factory for easier access
-    try:
-        yield conn
-        conn.commit()
-    except sqlite3.Error as e:
-        conn.rollback()
-        logger.error(f"Database error: {e}")  # Log the specific error
-        raise  # Re-raise after logging
-    finally:
-        conn.close()
+    # WAL lets readers proceed during writes; NORMAL only fsyncs at checkpoints
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
+    return conn
+
+
+def init(database_file: str, cache_reads: bool = False) -> None:
+    """Sets the database file used by all functions in this module.
+
+    Must be called before any other database function. Switching to a
+    different file closes the connection to the previous one. cache_reads
+    enables the dialog and user-existence caches, which are only safe when
+    this process is the only writer.
+    """
+    global _DB_FILE, _CACHE_READS
+    with _CONNECTION_LOCK:
+        if database_file != _DB_FILE:
+            close_db_connections()
+        _DB_FILE = database_file
+        _CACHE_READS = cache_reads
+        _DIALOG_CACHE.clear()
+        _EXISTS_CACHE.clear()
 
 
-def create_tables(config: Config) -> None:
+@contextmanager
+def get_db_connection() -> Generator[sqlite3.Connection, None, None]:
+    """Context manager yielding the shared connection.
+
+    The connection is opened on first use and kept for the life of the
+    process. Changes are committed on success and rolled back on any error.
+    """
+    global _CONNECTION
+    with _CONNECTION_LOCK:
+        conn = _CONNECTION
+        if conn is None:
+            if _DB_FILE is None:
+                raise RuntimeError("db.init() must be called before using the database")
+            conn = _CONNECTION = _open_connection(_DB_FILE)
+        try:
+            yield conn
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"Database error: {e}")  # Log the specific error
+            raise  # Re-raise after logging
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+def close_db_connections() -> None:
+    """Closes the shared connection and empties the read caches."""
+    global _CONNECTION
+    with _CONNECTION_LOCK:
+        if _CONNECTION is not None:
+            _CONNECTION.close()
+            _CONNECTION = None
+        _DIALOG_CACHE.clear()
+        _EXISTS_CACHE.clear()
+
+
+def _cache_get(cache: OrderedDict, key: tuple[str, str]):
+    """Returns the cached value for key, or None, refreshing its LRU position."""
+    if not _CACHE_READS:
+        return None
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def _cache_put(cache: OrderedDict, key: tuple[str, str], value) -> None:
+    if not _CACHE_READS:
+        return
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > _READ_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def _invalidate(key: tuple[str, str]) -> None:
+    _DIALOG_CACHE.pop(key, None)
+    _EXISTS_CACHE.pop(key, None)
+
+
+def create_tables() -> None:
     """Creates the necessary tables in the database."""
-    with get_db_connection(config.database_file) as conn:
+    with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS dialogs (
-                current_user TEXT NOT NULL,
-                user_id TEXT NOT NULL,
-                dialog TEXT,
-                last_modified_datetime TEXT,
-                last_modified_timestamp INTEGER,
-                PRIMARY KEY (current_user, user_id)
-            )
-        """
-        )
+        cursor.execute(_SQL_CREATE_DIALOGS)
+        cursor.execute(_SQL_CREATE_USER_MTIME_INDEX)
 
 
-def get_old_dialog(current_user: str, user_id: str, config: Config) -> str:
+def get_old_dialog(current_user: str, user_id: str) -> str:
     """Retrieves the previous dialog for a given user."""
-    with get_db_connection(config.database_file) as conn:
+    key = (current_user, user_id)
+    with _CONNECTION_LOCK:
+        dialog = _cache_get(_DIALOG_CACHE, key)
+        if dialog is not None:
+            return dialog
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_SQL_GET_DIALOG, (current_user, user_id))
+            result = cursor.fetchone()
+        dialog = (result["dialog"] or "") if result else ""
+        _cache_put(_DIALOG_CACHE, key, dialog)
+        return dialog
+
+
+def update_user_dialog(current_user: str, user_id: str, dialog: str) -> None:
+    """Updates the dialog for a given user."""
+    last_modified_timestamp = int(time.time())
+    with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            "SELECT dialog FROM dialogs WHERE current_user=? AND user_id=?",
-            (current_user, user_id),
-        )
-        result = cursor.fetchone()
-        return result["dialog"] if result else ""
+        cursor.execute(_SQL_SET_DIALOG, (dialog, last_modified_timestamp, current_user, user_id))
+        _invalidate((current_user, user_id))
 
 
-def update_user_dialog(
-    current_user: str, user_id: str, dialog: str, config: Config
-) -> None:
-    """Updates the dialog for a given user."""
-    last_modified_datetime = str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+def append_user_dialog(current_user: str, user_id: str, turn: str) -> None:
+    """Appends a turn to the stored dialog for a given user.
+
+    The concatenation happens in SQLite, so the existing history is neither
+    sent back from Python nor lost to a concurrent append.
+    """
+    append_user_dialogs([(current_user, user_id, turn)])
+
+
+def append_user_dialogs(appends: list[tuple[str, str, str]]) -> None:
+    """Applies (current_user, user_id, turn) appends in order, in one transaction."""
     last_modified_timestamp = int(time.time())
-    with get_db_connection(config.database_file) as conn:
+    with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE dialogs SET dialog=?, last_modified_datetime=?, "
-            "last_modified_timestamp=? WHERE current_user=? AND user_id=?",
-            (
-                dialog,
-                last_modified_datetime,
-                last_modified_timestamp,
-                current_user,
-                user_id,
-            ),
+        cursor.executemany(
+            _SQL_APPEND_DIALOG,
+            [(turn, last_modified_timestamp, cu, uid) for cu, uid, turn in appends],
         )
+        for cu, uid, _ in appends:
+            _invalidate((cu, uid))
 
 
-def reset_user_chat(current_user: str, user_id: str, config: Config) -> None:
+def reset_user_chat(current_user: str, user_id: str) -> None:
     """Resets the dialog for a given user to an empty string."""
-    update_user_dialog(current_user=current_user, user_id=user_id, dialog="", config=config)
+    update_user_dialog(current_user=current_user, user_id=user_id, dialog="")
 
 
-def is_user_id_in_db(current_user: str, user_id: str, config: Config) -> bool:
+def is_user_id_in_db(current_user: str, user_id: str) -> bool:
     """Checks if a user ID exists in the database."""
-    with get_db_connection(config.database_file) as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT 1 FROM dialogs WHERE current_user=? AND user_id=?",
-            (current_user, user_id),
-        )
-        return cursor.fetchone() is not None
-
-
-def add_user_to_db(current_user: str, user_id: str, config: Config) -> None:
+    key = (current_user, user_id)
+    with _CONNECTION_LOCK:
+        exists = _cache_get(_EXISTS_CACHE, key)
+        if exists is not None:
+            return exists
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_SQL_USER_EXISTS, (current_user, user_id))
+            exists = cursor.fetchone() is not None
+        _cache_put(_EXISTS_CACHE, key, exists)
+        return exists
+
+
+def add_user_to_db(current_user: str, user_id: str) -> None:
     """Adds a new user to the database with an empty dialog."""
-    last_modified_datetime = str(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
     last_modified_timestamp = int(time.time())
-    with get_db_connection(config.database_file) as conn:
+    with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO dialogs (current_user, user_id, dialog, "
-            "last_modified_datetime, last_modified_timestamp) VALUES (?, ?, ?, ?, ?)",
-            (current_user, user_id, "", last_modified_datetime, last_modified_timestamp),
-        )
+        cursor.execute(_SQL_ADD_USER, (current_user, user_id, "", last_modified_timestamp))
+        _invalidate((current_user, user_id))
 
 
-def delete_user_from_db(current_user: str, user_id: str, config: Config) -> None:
+def delete_user_from_db(current_user: str, user_id: str) -> None:
     """Deletes a user from the database."""
-    with get_db_connection(config.database_file) as conn:
+    with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            "DELETE FROM dialogs WHERE current_user=? AND user_id=?",
-            (current_user, user_id),
-        )
+        cursor.execute(_SQL_DELETE_USER, (current_user, user_id))
+        _invalidate((current_user, user_id))
 
 
-def get_user_count(current_user: str, config: Config) -> int:
+def get_user_count(current_user: str) -> int:
     """Gets the total number of users for a given WaifuAPI user."""
-    with get_db_connection(config.database_file) as conn:
+    with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM dialogs WHERE current_user=?", (current_user,))
+        cursor.execute(_SQL_COUNT_USERS, (current_user,))
         result = cursor.fetchone()
         return result[0] if result else 0
 
 
-def get_all_users(current_user: str, config: Config) -> list[str]:
+def get_all_users(current_user: str) -> list[str]:
     """Gets a list of all user IDs for a given WaifuAPI user."""
-    with get_db_connection(config.database_file) as conn:
+    with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT user_id FROM dialogs WHERE current_user=?", (current_user,))
+        cursor.execute(_SQL_ALL_USERS, (current_user,))
         return [row["user_id"] for row in cursor.fetchall()]
 
 
-def get_all_users_paged(current_user: str, page: int, config: Config) -> list[str]:
+def get_all_users_paged(current_user: str, page: int) -> list[str]:
     """Gets a page of user IDs, ordered by last modified timestamp."""
-    with get_db_connection(config.database_file) as conn:
+    with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            "SELECT user_id FROM dialogs WHERE current_user=? "
-            "ORDER BY last_modified_timestamp DESC LIMIT ?, 100",
-            (current_user, page * 100),
-        )
+        cursor.execute(_SQL_USERS_PAGE, (current_user, page * 100))
         return [row["user_id"] for row in cursor.fetchall()]
 
 
-def get_user_dialog(current_user: str, user_id: str, config: Config) -> str:
+def get_user_dialog(current_user: str, user_id: str) -> str:
     """Retrieves the dialog for a given user."""
-    return get_old_dialog(
-        current_user, user_id, config
-    )  # Re-use the existing function
+    return get_old_dialog(current_user, user_id)  # Re-use the existing function
 
 
-def get_user_last_modified_datetime(current_user: str, user_id: str, config: Config) -> str:
-    """Retrieves the last modified datetime for a given user."""
-    with get_db_connection(config.database_file) as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT last_modified_datetime FROM dialogs WHERE current_user=? AND user_id=?",
-            (current_user, user_id),
-        )
-        result = cursor.fetchone()
-        return result["last_modified_datetime"] if result else ""
+def get_user_last_modified_datetime(current_user: str, user_id: str) -> str:
+    """Retrieves the last modified datetime (local time) for a given user."""
+    timestamp = get_user_last_modified_timestamp(current_user, user_id)
+    if not timestamp:
+        return ""
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
 
 
-def get_user_last_modified_timestamp(
-    current_user: str, user_id: str, config: Config
-) -> int:
+def get_user_last_modified_timestamp(current_user: str, user_id: str) -> int:
     """Retrieves the last modified timestamp for a given user."""
-    with get_db_connection(config.database_file) as conn:
+    with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            "SELECT last_modified_timestamp FROM dialogs WHERE current_user=? AND user_id=?",
-            (current_user, user_id),
-        )
+        cursor.execute(_SQL_GET_TIMESTAMP, (current_user, user_id))
         result = cursor.fetchone()
-        return result["last_modified_timestamp"] if result else 0
\ No newline at end of file
+        return result["last_modified_timestamp"] if result else 0
+
+
+# --- Async wrappers ---
+# sqlite3 calls block, so the async tools run them on worker threads instead
+# of on the event loop. They go through anyio so they work on any backend; the
+# limiter is per event loop and caps the threads used for queries.
+_DB_THREADS = 4
+_DB_LIMITER: RunVar[anyio.CapacityLimiter] = RunVar("_DB_LIMITER")
+
+_T = TypeVar("_T")
+
+
+class _PendingAppend:
+    """A queued dialog append and the event set once it has been committed."""
+
+    __slots__ = ("append", "done", "error")
+
+    def __init__(self, append: tuple[str, str, str]):
+        self.append = append
+        self.done = anyio.Event()
+        self.error: Optional[Exception] = None
+
+
+# Dialog appends waiting to be committed, and whether a caller is writing them
+_PENDING_APPENDS: list[_PendingAppend] = []
+_FLUSHING = False
+_MAX_APPEND_BATCH = 64
+
+
+def _get_db_limiter() -> anyio.CapacityLimiter:
+    try:
+        return _DB_LIMITER.get()
+    except LookupError:
+        limiter = anyio.CapacityLimiter(_DB_THREADS)
+        _DB_LIMITER.set(limiter)
+        return limiter
+
+
+async def _run(func: Callable[..., _T], *args) -> _T:
+    return await anyio.to_thread.run_sync(func, *args, limiter=_get_db_limiter())
+
+
+async def aget_old_dialog(current_user: str, user_id: str) -> str:
+    return await _run(get_old_dialog, current_user, user_id)
+
+
+async def aappend_user_dialog(current_user: str, user_id: str, turn: str) -> None:
+    """Queues an append and waits until it has been committed.
+
+    If no write is in progress the caller commits its append straight away,
+    then keeps committing the appends queued behind it in batches until the
+    queue is empty; the other callers just wait for their batch.
+    """
+    global _FLUSHING
+    pending = _PendingAppend((current_user, user_id, turn))
+    _PENDING_APPENDS.append(pending)
+    if _FLUSHING:
+        await pending.done.wait()
+    else:
+        _FLUSHING = True
+        try:
+            # Shielded so cancelling this caller does not strand the queued appends
+            with anyio.CancelScope(shield=True):
+                await _flush_appends()
+        finally:
+            _FLUSHING = False
+    if pending.error is not None:
+        raise pending.error
+
+
+async def _flush_appends() -> None:
+    while _PENDING_APPENDS:
+        batch = _PENDING_APPENDS[:_MAX_APPEND_BATCH]
+        del _PENDING_APPENDS[:_MAX_APPEND_BATCH]
+        try:
+            await _run(append_user_dialogs, [pending.append for pending in batch])
+        except Exception as e:
+            for pending in batch:
+                pending.error = e
+        for pending in batch:
+            pending.done.set()
+
+
+async def areset_user_chat(current_user: str, user_id: str) -> None:
+    await _run(reset_user_chat, current_user, user_id)
+
+
+async def ais_user_id_in_db(current_user: str, user_id: str) -> bool:
+    return await _run(is_user_id_in_db, current_user, user_id)
+
+
+async def aadd_user_to_db(current_user: str, user_id: str) -> None:
+    await _run(add_user_to_db, current_user, user_id)
+
+
+async def adelete_user_from_db(current_user: str, user_id: str) -> None:
+    await _run(delete_user_from_db, current_user, user_id)
+
+
+async def aget_user_count(current_user: str) -> int:
+    return await _run(get_user_count, current_user)
+
+
+async def aget_user_dialog(current_user: str, user_id: str) -> str:
+    return await _run(get_user_dialog, current_user, user_id)
@@ -14,19 +14,17 @@ Model Categories:
 Features:
 - Comprehensive field validation with Pydantic
 - Detailed field descriptions for API documentation
-- Model validators for complex validation logic
+- Field defaults instead of per-instance validators where possible
 - Type hints for better IDE support and type checking
 - JSON serialization compatibility
-- Request/response model separation
+- Request/response model separation (response models are frozen and
+  ignore extra fields; request models forbid them)
 """
 
-from typing import Any
-
 from pydantic import (
     BaseModel,
     ConfigDict,
     Field,
-    model_validator,
 )
 
 
@@ -39,6 +37,8 @@ class User(BaseModel):
 class UserExists(User):
     """Response model for checking if a user exists."""
 
+    model_config = ConfigDict(frozen=True)
+
     exists: bool = Field(
         ..., description="Indicates whether the user exists (True) or not (False)."
     )
@@ -47,6 +47,8 @@ class UserExists(User):
 class UserMetadata(User):
     """Response model for getting user metadata."""
 
+    model_config = ConfigDict(frozen=True)
+
     last_modified_datetime: str = Field(
         ..., description="Last modified datetime in ISO 8601 format."
     )
@@ -66,24 +68,18 @@ class DialogEntry(BaseModel):
 class UserDialogJson(User):
     """Response model for getting or setting user dialog in JSON format."""
 
-    dialog: list[DialogEntry] | None = Field(
-        None, description="List of dialog entries, or null if no dialog is present."
-    )  # Can be None
+    model_config = ConfigDict(frozen=True)
 
-    @model_validator(mode="before")
-    @classmethod
-    def none_to_empty_list(cls, data: dict[str, Any]) -> dict[str, Any]:
-        """
-        sets dialog to [] if not set, also sets default status if not provided.
-        """
-        if "dialog" not in data:
-            data["dialog"] = []
-        return data
+    dialog: list[DialogEntry] = Field(
+        default_factory=list, description="List of dialog entries; empty if no dialog is present."
+    )
 
 
 class UserDialogStr(User):
     """Response model for getting user dialog as a string."""
 
+    model_config = ConfigDict(frozen=True)
+
     dialog: str | None = Field(
         None,
         description="Dialog history as a concatenated string, or null if no dialog "
@@ -94,6 +90,8 @@ class UserDialogStr(User):
 class UserCount(BaseModel):
     """Response model for getting the total number of users."""
 
+    model_config = ConfigDict(frozen=True)
+
     user_count: int | None = Field(
         None, description="The total number of users."
     )  # Can be None
@@ -102,6 +100,8 @@ class UserCount(BaseModel):
 class UserList(BaseModel):
     """Response model for getting a page of user IDs."""
 
+    model_config = ConfigDict(frozen=True)
+
     page: int = Field(..., description="The page number (0-indexed).")
     users: list[str] = Field(..., description="List of user IDs on the current page.")
 
@@ -109,6 +109,8 @@ class UserList(BaseModel):
 class ServerStatus(BaseModel):
     """Response model for checking server status."""
 
+    model_config = ConfigDict(frozen=True)
+
     status: str = Field(..., description='Server status, should be "ok".')
 
 
@@ -144,6 +146,8 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     """Response model for a chat message."""
 
+    model_config = ConfigDict(frozen=True)
+
     user_id: str = Field(..., description="Unique identifier for the user.")
     response: str = Field(..., description="The AI's response message.")
 
@@ -157,5 +161,5 @@ class ModelUrl(BaseModel):
     input: str
 
 class ModelUrlResponse(BaseModel):
-    model_config = ConfigDict(extra="forbid")
+    model_config = ConfigDict(frozen=True)
     model_url_response: str
\ No newline at end of file
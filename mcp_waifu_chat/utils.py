@@ -6,6 +6,7 @@ This module provides helper functions for data transformation and validation:
 Key Functions:
 - dialog_to_json(): Converts dialog strings to structured JSON format
 - json_to_dialog(): Converts JSON dialog data back to string format
+- truncate_dialog(): Keeps only the most recent turns of a dialog string
 
 Features:
 - Robust parsing of dialog strings with regex pattern matching
@@ -19,7 +20,10 @@ different dialog data formats and ensuring data consistency.
 """
 
 import re
-from typing import Any, Optional
+from typing import Any
+
+# Matches one 'Name said: "message"' turn; tolerates extra spaces.
+_DIALOG_RE = re.compile(r"\s*([^:]+)\s+said:\s*\"([^\"]*)\"")
 
 
 def dialog_to_json(dialog: str) -> list[dict[str, Any]]:
@@ -36,14 +40,11 @@ def dialog_to_json(dialog: str) -> list[dict[str, Any]]:
     if not dialog:  # Handle empty dialog string
         return []
 
-    output = []
-    # Find all occurrences of the pattern "Name said: "message""
-    # This regex is slightly more robust to extra spaces.
-    matches = re.findall(r"\s*([^:]+)\s+said:\s*\"([^\"]*)\"", dialog)
-
-    for index, (name, message) in enumerate(matches):
-        output.append({"index": index, "name": name.strip(), "message": message.strip()})
-    return output
+    # One entry per occurrence of the pattern "Name said: "message""
+    return [
+        {"index": index, "name": match[1].strip(), "message": match[2].strip()}
+        for index, match in enumerate(_DIALOG_RE.finditer(dialog))
+    ]
 
 
 def json_to_dialog(json_obj: dict[str, Any]) -> str:
@@ -59,19 +60,45 @@ def json_to_dialog(json_obj: dict[str, Any]) -> str:
     Returns:
         str: The dialog string, or an empty string if there's an error.
     """
-    try:
-        dialog: Optional[list[dict[str, Any]]] = json_obj.get("dialog")
-        if not dialog:
-            return ""  # Handle missing or empty dialog
-
-        dialog_strings = []
-        for entry in dialog:
-            name = entry.get("name")
-            message = entry.get("message")
-            if name is not None and message is not None:  # Both must be present
-                dialog_strings.append(f'{name} said: "{message}"')
-
-        return " ".join(dialog_strings)
-    except (KeyError, TypeError, AttributeError) as e:
-        # Handle cases where json_obj is malformed
-        return ""
\ No newline at end of file
+    # Handle a malformed json_obj or a missing or empty dialog
+    if not isinstance(json_obj, dict):
+        return ""
+    dialog = json_obj.get("dialog")
+    if not dialog or not isinstance(dialog, list):
+        return ""
+
+    # Entries that are not objects, or lack the name or the message, are skipped
+    return " ".join(
+        f'{name} said: "{message}"'
+        for entry in dialog
+        if isinstance(entry, dict)
+        and (name := entry.get("name")) is not None
+        and (message := entry.get("message")) is not None
+    )
+
+
+# Marks the start of each turn as written by the chat tool
+_TURN_MARKER = ' User said: "'
+
+
+def truncate_dialog(dialog: str, max_turns: int) -> str:
+    """Returns the last max_turns turns of a dialog string.
+
+    Scans backwards from the end, so the cost depends on the kept turns rather
+    than the full history.
+
+    Args:
+        dialog (str): The dialog string.
+        max_turns (int): Number of turns to keep; 0 or less keeps everything.
+
+    Returns:
+        str: The trailing turns of the dialog.
+    """
+    if max_turns <= 0:
+        return dialog
+    start = len(dialog)
+    for _ in range(max_turns):
+        start = dialog.rfind(_TURN_MARKER, 0, start)
+        if start == -1:
+            return dialog
+    return dialog[start:]
@@ -8,7 +8,7 @@ For production deployments, consider using a WSGI/ASGI server like Gunicorn
 with the FastMCP app instance from mcp_waifu_chat.api:app
 """
 
-from mcp_waifu_api.api import app
+from mcp_waifu_chat.api import app
 
 if __name__ == "__main__":
     app.run()
\ No newline at end of file
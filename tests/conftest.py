@@ -4,8 +4,14 @@ Pytest configuration and fixtures for the MCP Waifu Chat Server tests.
 This module provides shared fixtures and configuration for the test suite:
 
 Fixtures:
-- database: Creates and tears down test SQLite database for each test function
-- client: Provides FastMCP test client with proper configuration
+- database: Creates and tears down an in-memory SQLite database for each test function
+- app_client: Starts the FastMCP test client once per test module
+- client: Provides the shared test client with this test's database and configuration
+
+Markers:
+- asyncio_only: Runs an anyio test on the asyncio backend only, for code built
+  on asyncio tasks (ai.py and the server lifespan); other anyio tests run on
+  every available backend
 
 Configuration:
 - Test database isolation with automatic cleanup
@@ -17,58 +23,54 @@ These fixtures ensure that tests run in isolation with clean state and
 proper teardown to prevent test interference.
 """
 
-import os
-import sqlite3
+import uuid
 
 import pytest
 from starlette.testclient import TestClient # Use Starlette's TestClient for FastMCP
 
 from mcp_waifu_chat.api import app  # Import your FastMCP app
 from mcp_waifu_chat.config import Config
-from mcp_waifu_chat.db import create_tables
+from mcp_waifu_chat.db import close_db_connections, create_tables, init
+
+
+def pytest_configure(config: pytest.Config):
+    config.addinivalue_line("markers", "asyncio_only: run the anyio test on asyncio only")
 
 
-# Override the database file for testing
-TEST_DATABASE_FILE = "test_dialogs.db"
+@pytest.hookimpl(tryfirst=True)
+def pytest_generate_tests(metafunc: pytest.Metafunc):
+    # Runs before the fixture parametrization so this overrides anyio_backend,
+    # which is otherwise parametrized over every available backend
+    if metafunc.definition.get_closest_marker("asyncio_only"):
+        metafunc.parametrize("anyio_backend", ["asyncio"], scope="module")
 
 
 @pytest.fixture(scope="function") # Change scope to function for test isolation
 def database():
-    """Create a test database and tables for each test function."""
-    # Ensure the test database file does not exist before each test
-    if os.path.exists(TEST_DATABASE_FILE):
-        os.remove(TEST_DATABASE_FILE)
-
-    # Create a new config instance pointing to the test DB
-    config = Config(database_file=TEST_DATABASE_FILE)
-    create_tables(config)  # Use the function to create tables
+    """Create an in-memory test database and tables for each test function."""
+    # A uniquely named shared-cache memory database keeps tests isolated without
+    # touching the filesystem; it lives as long as the shared connection does.
+    config = Config(database_file=f"file:test_dialogs_{uuid.uuid4().hex}?mode=memory&cache=shared")
+    init(config.database_file)
+    create_tables()  # Use the function to create tables
 
     yield config  # Provide the config to the test
 
-    # Teardown: Remove the test database file after each test
-    # Add a check in case the file wasn't created or was already removed
-    if os.path.exists(TEST_DATABASE_FILE):
-        # Attempt to close any potential lingering connections (though function scope should handle this)
-        # This might not be strictly necessary but can help on some platforms/setups
-        try:
-            # We don't have the connection object here, so direct removal is the main cleanup
-            pass
-        finally:
-             # Ensure removal even if closing fails (though closing isn't attempted here)
-            try:
-                os.remove(TEST_DATABASE_FILE)
-            except PermissionError:
-                 # Handle potential file locking issues if teardown happens too quickly
-                 # or if a test didn't close its connection properly (less likely with function scope)
-                 print(f"Warning: Could not remove test database {TEST_DATABASE_FILE} during teardown.")
+    # Teardown: closing the shared connection discards the database
+    close_db_connections()
+
+
+@pytest.fixture(scope="module")
+def app_client():
+    """FastMCP app test client, started once per test module."""
+    # Use Starlette's TestClient with the FastMCP ASGI app
+    with TestClient(app.sse_app()) as client:
+        yield client
 
 
 @pytest.fixture
-def client(database: Config): # Add type hint for clarity
-    """FastMCP app test client fixture."""
+def client(database: Config, app_client: TestClient): # Add type hint for clarity
+    """FastMCP app test client fixture backed by this test's database."""
     # Assign the function-scoped test config to the app instance for this test
     app.config = database
-    # Remove setting testing=True on frozen config
-    # Use Starlette's TestClient with the FastMCP ASGI app
-    with TestClient(app.sse_app()) as client:
-        yield client
\ No newline at end of file
+    yield app_client
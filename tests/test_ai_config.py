@@ -15,7 +15,6 @@ These tests ensure that the configuration system correctly handles various
 input sources and provides reliable fallbacks for production deployments.
 """
 
-import os
 from pathlib import Path
 
 import pytest
@@ -39,7 +38,9 @@ def clear_env(monkeypatch: pytest.MonkeyPatch):
         "GOOGLE_API_KEY",
     ]:
         monkeypatch.delenv(k, raising=False)
+    Config.load.cache_clear()
     yield
+    Config.load.cache_clear()
 
 
 def test_default_provider_is_openrouter():
@@ -53,6 +54,15 @@ def test_env_overrides_default_provider(monkeypatch: pytest.MonkeyPatch):
     assert cfg.default_provider == "gemini"
 
 
+def test_unknown_provider_falls_back_to_openrouter(
+    monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+):
+    monkeypatch.setenv("DEFAULT_PROVIDER", "no-such-provider")
+    cfg = Config.load()
+    assert cfg.default_provider == "openrouter"
+    assert "no-such-provider" in caplog.text
+
+
 def test_openrouter_model_env_overrides(monkeypatch: pytest.MonkeyPatch):
     monkeypatch.setenv("OPENROUTER_MODEL_NAME", "openrouter/free")
     cfg = Config.load()
@@ -0,0 +1,189 @@
+"""
+Tests for OpenRouter response generation in the MCP Waifu Chat Server.
+
+This module exercises ai.generate_response against a mocked OpenRouter endpoint:
+
+Test Coverage:
+- Streamed (SSE) completion parsing
+- Fallback to the default response on upstream errors
+- Retries of rate-limited and unavailable upstream responses
+- Skipping of malformed (undecodable or wrongly shaped) stream chunks
+- Response cache hits for repeated prompts
+- Coalescing of identical concurrent prompts
+- Keep-alive connection reuse across streamed completions
+
+The shared httpx client is replaced by one backed by httpx.MockTransport, so
+no network access is needed. Connection reuse is checked against a local
+chunked SSE server instead, since MockTransport has no connection pool.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import mcp_waifu_chat.ai as ai
+from mcp_waifu_chat.config import Config
+
+
+# ai.py shares in-flight requests through asyncio tasks, as FastMCP runs on asyncio
+pytestmark = pytest.mark.asyncio_only
+
+
+def _sse(*contents: str) -> bytes:
+    events = [b": OPENROUTER PROCESSING\n\n"]
+    for content in contents:
+        events.append(b'data: {"choices":[{"delta":{"content":"%s"}}]}\n\n' % content.encode())
+    events.append(b'data: {"choices":[{"delta":{},"finish_reason":"stop"}]}\n\n')
+    events.append(b"data: [DONE]\n\n")
+    return b"".join(events)
+
+
+@pytest.fixture
+async def upstream(monkeypatch: pytest.MonkeyPatch):
+    """Routes OpenRouter calls to a mock handler and records the requests."""
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(ai, "_BACKOFF_FACTOR", 0)
+    monkeypatch.setattr(ai, "_REQUEST_SLOTS", None)
+    ai._RESPONSE_CACHE.clear()
+    # "queue" holds one-off responses served before falling back to "response"
+    state = {"calls": 0, "queue": [], "response": httpx.Response(200, content=_sse("Hel", "lo"))}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        state["calls"] += 1
+        await asyncio.sleep(0.01)
+        return state["queue"].pop(0) if state["queue"] else state["response"]
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ai, "_HTTP_CLIENT", client)
+    yield state
+    ai._RESPONSE_CACHE.clear()
+    await client.aclose()
+
+
+@pytest.mark.anyio
+async def test_generate_response_joins_streamed_chunks(upstream):
+    assert await ai.generate_response("hi", Config()) == "Hello"
+
+
+@pytest.mark.anyio
+async def test_generate_response_falls_back_on_error(upstream):
+    upstream["response"] = httpx.Response(400, text="bad request")
+    config = Config()
+    assert await ai.generate_response("hi", config) == config.default_response
+
+
+@pytest.mark.anyio
+async def test_generate_response_retries_transient_statuses(upstream):
+    upstream["queue"] = [httpx.Response(429), httpx.Response(503)]
+    assert await ai.generate_response("hi", Config()) == "Hello"
+    assert upstream["calls"] == 3
+
+
+@pytest.mark.anyio
+async def test_generate_response_falls_back_when_retries_run_out(upstream):
+    upstream["response"] = httpx.Response(429, text="rate limited")
+    config = Config()
+    assert await ai.generate_response("hi", config) == config.default_response
+    assert upstream["calls"] == ai._MAX_RETRIES + 1
+
+
+_MALFORMED_CHUNKS = [
+    b"{not json",
+    b"42",
+    b"[]",
+    b'{"choices": "x"}',
+    b'{"choices": [1]}',
+    b'{"choices": [{"delta": "x"}]}',
+    b'{"choices": [{"delta": {"content": 5}}]}',
+]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("chunk", _MALFORMED_CHUNKS)
+async def test_generate_response_skips_malformed_chunks(upstream, chunk):
+    upstream["response"] = httpx.Response(200, content=b"data: " + chunk + b"\n\n" + _sse("Hi"))
+    assert await ai.generate_response("hi", Config()) == "Hi"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("chunk", _MALFORMED_CHUNKS)
+async def test_generate_response_falls_back_on_only_malformed_chunks(upstream, chunk):
+    upstream["response"] = httpx.Response(200, content=b"data: " + chunk + b"\n\ndata: [DONE]\n\n")
+    config = Config()
+    assert await ai.generate_response("hi", config) == config.default_response
+
+
+@pytest.mark.anyio
+async def test_generate_response_uses_cache_for_repeated_prompt(upstream):
+    config = Config()
+    assert await ai.generate_response("hi", config) == "Hello"
+    assert await ai.generate_response("hi", config) == "Hello"
+    assert upstream["calls"] == 1
+
+
+@pytest.mark.anyio
+async def test_generate_response_cache_can_be_disabled(upstream):
+    config = Config(response_cache_size=0)
+    await ai.generate_response("hi", config)
+    await ai.generate_response("hi", config)
+    assert upstream["calls"] == 2
+
+
+@pytest.mark.anyio
+async def test_concurrent_identical_prompts_share_one_call(upstream):
+    config = Config(response_cache_size=0)
+    results = await asyncio.gather(*(ai.generate_response("hi", config) for _ in range(4)))
+    assert results == ["Hello"] * 4
+    assert upstream["calls"] == 1
+
+
+@pytest.fixture
+async def local_upstream(monkeypatch: pytest.MonkeyPatch):
+    """Serves chunked SSE completions on localhost and counts TCP connections."""
+    state = {"connections": 0}
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        state["connections"] += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = next(
+                    int(line.split(b":", 1)[1])
+                    for line in head.split(b"\r\n")
+                    if line.lower().startswith(b"content-length:")
+                )
+                await reader.readexactly(length)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                    b"Transfer-Encoding: chunked\r\n\r\n"
+                )
+                for event in _sse("Hi").split(b"\n\n")[:-1]:
+                    event += b"\n\n"
+                    writer.write(b"%x\r\n%s\r\n" % (len(event), event))
+                    await writer.drain()
+                    await asyncio.sleep(0.005)
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test-key")
+    monkeypatch.setattr(ai, "OPENROUTER_API_URL", f"http://127.0.0.1:{port}/chat/completions")
+    monkeypatch.setattr(ai, "_HTTP_CLIENT", None)
+    monkeypatch.setattr(ai, "_REQUEST_SLOTS", None)
+    yield state
+    await ai.aclose()
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.anyio
+async def test_streamed_completions_reuse_the_connection(local_upstream):
+    for _ in range(3):
+        assert await ai._openrouter_chat("hi", model_name="test-model") == "Hi"
+    assert local_upstream["connections"] == 1
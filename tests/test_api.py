@@ -16,12 +16,23 @@ testing limitations and will need adaptation for proper mocking or
 integration testing approaches.
 """
 
-import json
-from typing import Any
+import asyncio
+from types import SimpleNamespace
 
 import pytest
 from flask.testing import FlaskClient
 
+from mcp_waifu_chat import ai, api, db
+from mcp_waifu_chat.api import _DEFAULT_CURRENT_USER, _get_current_user
+from mcp_waifu_chat.config import Config
+
+
+def test_get_current_user_from_request_meta():
+    meta = SimpleNamespace(headers={"current-user": "alice"})
+    assert _get_current_user(SimpleNamespace(meta=meta)) == "alice"
+    assert _get_current_user(SimpleNamespace(meta={"headers": {"current-user": "bob"}})) == "bob"
+    assert _get_current_user(SimpleNamespace(meta=None)) == _DEFAULT_CURRENT_USER
+
 
 def test_server_status(client: FlaskClient):
     # Can't test with FastMCP
@@ -107,4 +118,50 @@ async def test_chat_message_form(client: FlaskClient):
 @pytest.mark.anyio
 async def test_chat_message_json(client: FlaskClient):
    # Can't test with FastMCP
-   pass
\ No newline at end of file
+   pass
+
+
+@pytest.mark.anyio
+@pytest.mark.asyncio_only  # chat's real path goes through ai.py, which is asyncio-only
+async def test_chat_generates_and_stores_turn(database: Config, monkeypatch: pytest.MonkeyPatch):
+    calls = []
+
+    async def fake_generate_response(prompt: str, config: Config) -> str:
+        calls.append((prompt, config))
+        return "Hello!"
+
+    monkeypatch.setattr(ai, "generate_response", fake_generate_response)
+    monkeypatch.setattr(api.app, "config", database)
+    db.add_user_to_db(_DEFAULT_CURRENT_USER, "test_user")
+    context = SimpleNamespace(request_context=SimpleNamespace(meta=None))
+
+    result = await api.chat("Hi", "test_user", context)
+
+    assert result == {"user_id": "test_user", "response": "Hello!"}
+    assert calls == [(' User said: "Hi" Waifu said: "', database)]
+    assert db.get_old_dialog(_DEFAULT_CURRENT_USER, "test_user") == ' User said: "Hi" Waifu said: "Hello!"'
+
+
+@pytest.mark.anyio
+@pytest.mark.asyncio_only
+async def test_lifespan_warms_up_once_in_background(monkeypatch: pytest.MonkeyPatch):
+    warmups = []
+    closed = []
+
+    async def slow_warmup(config: Config) -> None:
+        warmups.append(config)
+        await asyncio.sleep(60)
+
+    async def fake_aclose() -> None:
+        closed.append(True)
+
+    monkeypatch.setattr(ai, "warmup", slow_warmup)
+    monkeypatch.setattr(ai, "aclose", fake_aclose)
+    server = SimpleNamespace(config=Config())
+    # Entering must not wait on the 60 s warmup
+    async with api.lifespan(server):
+        async with api.lifespan(server):
+            await asyncio.sleep(0)
+        assert closed == []
+    assert len(warmups) == 1
+    assert closed == [True]
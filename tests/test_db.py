@@ -9,6 +9,7 @@ Test Coverage:
 - Dialog storage and retrieval
 - Dialog updates and resets
 - User existence checking
+- Read caching and invalidation
 - User counting and listing
 - Pagination functionality
 - Metadata tracking (timestamps, modification history)
@@ -18,10 +19,17 @@ All tests use isolated database instances to ensure test independence
 and proper cleanup between test runs.
 """
 
+import asyncio
+import sqlite3
+
 import pytest
 
+from mcp_waifu_chat import db
 from mcp_waifu_chat.db import (
+    aappend_user_dialog,
     add_user_to_db,
+    append_user_dialog,
+    append_user_dialogs,
     create_tables,
     delete_user_from_db,
     get_all_users,
@@ -31,6 +39,7 @@ from mcp_waifu_chat.db import (
     get_user_dialog,
     get_user_last_modified_datetime,
     get_user_last_modified_timestamp,
+    init,
     is_user_id_in_db,
     reset_user_chat,
     update_user_dialog,
@@ -47,71 +56,123 @@ def test_config(database):
 def test_create_tables(test_config: Config):
     # This test is now redundant as tables are created in the fixture.
     # We keep it to verify that create_tables doesn't raise exceptions.
-    create_tables(test_config)  # Already called in the fixture, but test idempotency
+    create_tables()  # Already called in the fixture, but test idempotency
 
 
 def test_add_user(test_config: Config):
-    add_user_to_db("test_current_user", "test_user", test_config)
-    assert is_user_id_in_db("test_current_user", "test_user", test_config) is True
+    add_user_to_db("test_current_user", "test_user")
+    assert is_user_id_in_db("test_current_user", "test_user") is True
 
 
 def test_get_old_dialog(test_config: Config):
-    add_user_to_db("test_current_user", "test_user", test_config)
-    update_user_dialog(
-        "test_current_user", "test_user", "Test dialog", test_config
-    )  # add some data
-    dialog = get_old_dialog("test_current_user", "test_user", test_config)
+    add_user_to_db("test_current_user", "test_user")
+    update_user_dialog("test_current_user", "test_user", "Test dialog")  # add some data
+    dialog = get_old_dialog("test_current_user", "test_user")
     assert dialog == "Test dialog"
-    dialog = get_old_dialog("test_current_user", "nonexistent_user", test_config)
+    dialog = get_old_dialog("test_current_user", "nonexistent_user")
     assert dialog == ""
 
 
 def test_update_user_dialog(test_config: Config):
-    add_user_to_db("test_current_user", "test_user", test_config)  # make sure it exists
-    update_user_dialog(
-        "test_current_user", "test_user", "Updated dialog", test_config
-    )
-    dialog = get_old_dialog("test_current_user", "test_user", test_config)
+    add_user_to_db("test_current_user", "test_user")  # make sure it exists
+    update_user_dialog("test_current_user", "test_user", "Updated dialog")
+    dialog = get_old_dialog("test_current_user", "test_user")
     assert dialog == "Updated dialog"
 
 
+def test_append_user_dialog(test_config: Config):
+    add_user_to_db("test_current_user", "test_user")
+    append_user_dialog("test_current_user", "test_user", "First turn.")
+    append_user_dialog("test_current_user", "test_user", " Second turn.")
+    dialog = get_old_dialog("test_current_user", "test_user")
+    assert dialog == "First turn. Second turn."
+    # Appending for an unknown user does not create it
+    append_user_dialog("test_current_user", "nonexistent_user", "Turn.")
+    assert is_user_id_in_db("test_current_user", "nonexistent_user") is False
+
+
+def test_dialog_reads_are_cached_until_written(test_config: Config):
+    init(test_config.database_file, cache_reads=True)
+    add_user_to_db("test_current_user", "test_user")
+    assert get_old_dialog("test_current_user", "test_user") == ""
+    # A write that bypasses db.py is not seen until the row is written through it
+    conn = sqlite3.connect(test_config.database_file, uri=True)
+    try:
+        with conn:
+            conn.execute("UPDATE dialogs SET dialog='external'")
+    finally:
+        conn.close()
+    assert get_old_dialog("test_current_user", "test_user") == ""
+    update_user_dialog("test_current_user", "test_user", "Updated")
+    assert get_old_dialog("test_current_user", "test_user") == "Updated"
+
+
+def test_dialog_reads_are_not_cached_by_default(test_config: Config):
+    add_user_to_db("test_current_user", "test_user")
+    assert get_old_dialog("test_current_user", "test_user") == ""
+    conn = sqlite3.connect(test_config.database_file, uri=True)
+    try:
+        with conn:
+            conn.execute("UPDATE dialogs SET dialog='external'")
+    finally:
+        conn.close()
+    assert get_old_dialog("test_current_user", "test_user") == "external"
+
+
+def test_concurrent_appends_are_batched_in_order(test_config: Config, monkeypatch: pytest.MonkeyPatch):
+    add_user_to_db("test_current_user", "test_user")
+    batches = []
+
+    def recording_append_user_dialogs(appends):
+        batches.append(len(appends))
+        append_user_dialogs(appends)
+
+    monkeypatch.setattr(db, "append_user_dialogs", recording_append_user_dialogs)
+
+    async def burst():
+        await asyncio.gather(
+            *(aappend_user_dialog("test_current_user", "test_user", str(i)) for i in range(10))
+        )
+
+    asyncio.run(burst())
+    assert get_old_dialog("test_current_user", "test_user") == "0123456789"
+    # The first append is written straight away, the rest queue behind it
+    assert batches == [1, 9]
+
+
 def test_reset_user_chat(test_config: Config):
-    add_user_to_db("test_current_user", "test_user", test_config)  # make sure it exists
-    update_user_dialog(
-        "test_current_user", "test_user", "Initial dialog", test_config
-    )
-    reset_user_chat("test_current_user", "test_user", test_config)
-    dialog = get_old_dialog("test_current_user", "test_user", test_config)
+    add_user_to_db("test_current_user", "test_user")  # make sure it exists
+    update_user_dialog("test_current_user", "test_user", "Initial dialog")
+    reset_user_chat("test_current_user", "test_user")
+    dialog = get_old_dialog("test_current_user", "test_user")
     assert dialog == ""
 
 
 def test_is_user_id_in_db(test_config: Config):
-    add_user_to_db("test_current_user", "test_user", test_config)
-    assert is_user_id_in_db("test_current_user", "test_user", test_config) is True
-    assert (
-        is_user_id_in_db("test_current_user", "nonexistent_user", test_config) is False
-    )
+    add_user_to_db("test_current_user", "test_user")
+    assert is_user_id_in_db("test_current_user", "test_user") is True
+    assert is_user_id_in_db("test_current_user", "nonexistent_user") is False
 
 
 def test_delete_user_from_db(test_config: Config):
-    add_user_to_db("test_current_user", "test_user", test_config)
-    delete_user_from_db("test_current_user", "test_user", test_config)
-    assert is_user_id_in_db("test_current_user", "test_user", test_config) is False
+    add_user_to_db("test_current_user", "test_user")
+    delete_user_from_db("test_current_user", "test_user")
+    assert is_user_id_in_db("test_current_user", "test_user") is False
 
 
 def test_get_user_count(test_config: Config):
-    add_user_to_db("test_current_user", "test_user1", test_config)
-    add_user_to_db("test_current_user", "test_user2", test_config)
-    count = get_user_count("test_current_user", test_config)
+    add_user_to_db("test_current_user", "test_user1")
+    add_user_to_db("test_current_user", "test_user2")
+    count = get_user_count("test_current_user")
     assert count == 2
-    count = get_user_count("nonexistent_current_user", test_config)
+    count = get_user_count("nonexistent_current_user")
     assert count == 0
 
 
 def test_get_all_users(test_config: Config):
-    add_user_to_db("test_current_user", "test_user1", test_config)
-    add_user_to_db("test_current_user", "test_user2", test_config)
-    users = get_all_users("test_current_user", test_config)
+    add_user_to_db("test_current_user", "test_user1")
+    add_user_to_db("test_current_user", "test_user2")
+    users = get_all_users("test_current_user")
     assert len(users) == 2
     assert "test_user1" in users
     assert "test_user2" in users
@@ -119,45 +180,29 @@ def test_get_all_users(test_config: Config):
 
 def test_get_all_users_paged(test_config: Config):
     for i in range(150):
-        add_user_to_db("test_current_user", f"test_user{i}", test_config)
-    users_page_0 = get_all_users_paged("test_current_user", 0, test_config)
+        add_user_to_db("test_current_user", f"test_user{i}")
+    users_page_0 = get_all_users_paged("test_current_user", 0)
     assert len(users_page_0) == 100
-    users_page_1 = get_all_users_paged("test_current_user", 1, test_config)
+    users_page_1 = get_all_users_paged("test_current_user", 1)
     assert len(users_page_1) == 50
 
 
 def test_get_user_dialog(test_config: Config):
-    add_user_to_db("test_current_user", "test_user", test_config)
-    update_user_dialog(
-        "test_current_user", "test_user", "Test dialog", test_config
-    )  # add some data
-    dialog = get_user_dialog("test_current_user", "test_user", test_config)
+    add_user_to_db("test_current_user", "test_user")
+    update_user_dialog("test_current_user", "test_user", "Test dialog")  # add some data
+    dialog = get_user_dialog("test_current_user", "test_user")
     assert dialog == "Test dialog"
 
 
 def test_get_user_last_modified_datetime(test_config: Config):
-    add_user_to_db("test_current_user", "test_user", test_config)
-    datetime = get_user_last_modified_datetime(
-        "test_current_user", "test_user", test_config
-    )
+    add_user_to_db("test_current_user", "test_user")
+    datetime = get_user_last_modified_datetime("test_current_user", "test_user")
     assert isinstance(datetime, str)
-    assert (
-        get_user_last_modified_datetime(
-            "test_current_user", "nonexistent_user", test_config
-        )
-        == ""
-    )
+    assert get_user_last_modified_datetime("test_current_user", "nonexistent_user") == ""
 
 
 def test_get_user_last_modified_timestamp(test_config: Config):
-    add_user_to_db("test_current_user", "test_user", test_config)
-    timestamp = get_user_last_modified_timestamp(
-        "test_current_user", "test_user", test_config
-    )
+    add_user_to_db("test_current_user", "test_user")
+    timestamp = get_user_last_modified_timestamp("test_current_user", "test_user")
     assert isinstance(timestamp, int)
-    assert (
-        get_user_last_modified_timestamp(
-            "test_current_user", "nonexistent_user", test_config
-        )
-        == 0
-    )
\ No newline at end of file
+    assert get_user_last_modified_timestamp("test_current_user", "nonexistent_user") == 0
\ No newline at end of file
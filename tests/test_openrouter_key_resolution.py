@@ -14,6 +14,7 @@ These tests ensure that OpenRouter API key resolution works correctly
 in various deployment scenarios and configurations.
 """
 
+import os
 from importlib import reload
 from pathlib import Path
 
@@ -47,4 +48,18 @@ def test_openrouter_key_from_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatc
     monkeypatch.setenv("USERPROFILE", str(fake_home))
     reload(ai)
     key = ai._resolve_openrouter_api_key()  # type: ignore[attr-defined]
-    assert key == "file-key"
\ No newline at end of file
+    assert key == "file-key"
+
+def test_openrouter_key_file_rotation_is_picked_up(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    fake_home = tmp_path
+    key_file = fake_home / ".api-openrouter"
+    key_file.write_text("old-key", encoding="utf-8")
+    monkeypatch.setenv("HOME", str(fake_home))
+    monkeypatch.setenv("USERPROFILE", str(fake_home))
+    reload(ai)
+    assert ai._resolve_openrouter_api_key() == "old-key"  # type: ignore[attr-defined]
+    key_file.write_text("new-key", encoding="utf-8")
+    # Bump the mtime explicitly; coarse filesystem clocks may not register the rewrite
+    stat = key_file.stat()
+    os.utime(key_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert ai._resolve_openrouter_api_key() == "new-key"  # type: ignore[attr-defined]
@@ -0,0 +1,40 @@
+"""
+Tests for the dialog helpers in the MCP Waifu Chat Server.
+
+Test Coverage:
+- Parsing a dialog string into indexed turns
+- Serializing dialog JSON back to a string
+- Truncating a dialog string to its most recent turns
+"""
+
+from mcp_waifu_chat.utils import dialog_to_json, json_to_dialog, truncate_dialog
+
+DIALOG = ''.join(f' User said: "m{i}" Waifu said: "r{i}"' for i in range(5))
+
+
+def test_dialog_to_json_parses_turns():
+    assert dialog_to_json(' User said: "hi"  Waifu said:  " hello "') == [
+        {"index": 0, "name": "User", "message": "hi"},
+        {"index": 1, "name": "Waifu", "message": "hello"},
+    ]
+    assert dialog_to_json("") == []
+
+
+def test_json_to_dialog_skips_incomplete_entries():
+    entries = [{"name": "User", "message": "hi"}, {"name": "Waifu"}, {"name": "Waifu", "message": "hello"}]
+    assert json_to_dialog({"dialog": entries}) == 'User said: "hi" Waifu said: "hello"'
+    assert json_to_dialog({}) == ""
+    assert json_to_dialog({"dialog": ["not an entry", {"name": "User", "message": "hi"}]}) == 'User said: "hi"'
+    assert json_to_dialog({"dialog": "not a list"}) == ""
+    assert json_to_dialog(None) == ""
+
+
+def test_truncate_dialog_keeps_last_turns():
+    assert truncate_dialog(DIALOG, 2) == ' User said: "m3" Waifu said: "r3" User said: "m4" Waifu said: "r4"'
+
+
+def test_truncate_dialog_keeps_short_or_unbounded_dialogs():
+    assert truncate_dialog(DIALOG, 5) == DIALOG
+    assert truncate_dialog(DIALOG, 10) == DIALOG
+    assert truncate_dialog(DIALOG, 0) == DIALOG
+    assert truncate_dialog("", 3) == ""